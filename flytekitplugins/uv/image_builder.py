@@ -1,6 +1,15 @@
+import collections
+import contextlib
+import ctypes
+import ctypes.util
+import errno
+import functools
+import json
 import os
 import shutil
+import stat
 import subprocess
+import sys
 import tempfile
 from pathlib import Path
 
@@ -16,16 +25,443 @@ from flytekit.tools.ignore import (
     IgnoreGroup,
     StandardIgnore,
 )
-from flytekit.tools.script_mode import ls_files
+from flytekit.tools.script_mode import EXCLUDE_DIRS, ls_files
 
 DEFAULT_PYTHON_VERSION = "3.12"
-DEFAULT_UV_IMAGE = "ghcr.io/astral-sh/uv:python3.12-bookworm-slim"
+UV_IMAGE = "ghcr.io/astral-sh/uv:python{python_version}-bookworm-slim"
+RUNTIME_IMAGE = "python:{python_version}-slim-bookworm"
+DEFAULT_UV_IMAGE = UV_IMAGE.format(python_version=DEFAULT_PYTHON_VERSION)
 DEFAULT_FLYTEKIT_VERSION = "1.16.1"
+# stable tag of the registry cache exported by every build for the next one
+CACHE_TAG = "buildcache"
+
+_FLYTEKIT_VERSION = flytekit.__version__ or DEFAULT_FLYTEKIT_VERSION
+
+# file names never copied from source_root when the builder generates them
+_UV_IGNORED = frozenset({"pyproject.toml", "uv.lock"})
+# directory of the extra build context holding the targets of symlinked sources
+_SYMLINKS_DIR = ".source-symlinks"
+# path of the uv binary in the uv image
+_UV_BIN = "/usr/local/bin/uv"
+# directory of the extra build context holding the uv.lock and its pyproject.toml
+_LOCK_FILES_DIR = ".uv-lock"
+# buildx drivers able to export a registry cache
+_REGISTRY_CACHE_DRIVERS = frozenset({"docker-container", "kubernetes", "remote"})
+# number of trailing build log lines reported when docker build fails
+_BUILD_LOG_TAIL = 50
+# errnos for which a hardlink cannot be created and a copy is needed instead
+_LINK_FALLBACK_ERRNOS = (errno.EXDEV, errno.EPERM, errno.EMLINK)
+# errnos signalling that the filesystem does not support copy-on-write clones
+_REFLINK_UNSUPPORTED_ERRNOS = (
+    errno.EOPNOTSUPP,
+    errno.ENOTSUP,
+    errno.ENOTTY,
+    errno.EINVAL,
+    errno.EXDEV,
+    errno.ENOSYS,
+)
+# largest count accepted by a single sendfile call on Linux
+_SENDFILE_CHUNK = 0x7FFFF000
+# ioctl request number of FICLONE on Linux
+_FICLONE = 0x40049409
+# reflink capability per device, probed on the first clone attempt
+_REFLINK_SUPPORT: dict[int, bool] = {}
 
 
 class UVIgnore(Ignore):
     def _is_ignored(self, path: str) -> bool:
-        return path.endswith("pyproject.toml") or path.endswith("uv.lock")
+        return path.rpartition(os.sep)[2] in _UV_IGNORED
+
+
+def _render_pyproject(image_spec: ImageSpec, python_version: str) -> str:
+    """
+    Render a pyproject.toml depending on flytekit and image_spec.packages, so
+    that they are resolved and installed by a single uv sync.
+    """
+    dependencies = [f"flytekit=={_FLYTEKIT_VERSION}", *(image_spec.packages or [])]
+    lines = [
+        "[project]",
+        'name = "root"',
+        'version = "0.1.0"',
+        f"requires-python = {json.dumps(f'>={python_version}')}",
+        "dependencies = [",
+        *(f"    {json.dumps(dependency)}," for dependency in dependencies),
+        "]",
+    ]
+    indexes = []
+    if image_spec.pip_index:
+        indexes.append(image_spec.pip_index)
+    if image_spec.pip_extra_index_url:
+        indexes.extend(image_spec.pip_extra_index_url)
+    for index in indexes:
+        lines.extend(["", "[[tool.uv.index]]", f"url = {json.dumps(index)}"])
+    return "\n".join(lines) + "\n"
+
+
+def _ficlone(src: str, dst: str | Path) -> None:
+    import fcntl
+
+    # O_EXCL: never write through an existing dst, it may be a hardlink
+    fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+    with open(src, "rb") as fsrc, open(fd, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+    shutil.copymode(src, dst)
+
+
+def _load_clonefile():
+    libc_path = ctypes.util.find_library("c")
+    if libc_path is None:
+        return None
+    libc = ctypes.CDLL(libc_path, use_errno=True)
+    clonefile = getattr(libc, "clonefile", None)
+    if clonefile is None:
+        return None
+    clonefile.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int]
+    clonefile.restype = ctypes.c_int
+
+    def _clonefile(src: str, dst: str | Path) -> None:
+        if clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), src)
+
+    return _clonefile
+
+
+def _sendfile_copy(src: str, dst: str | Path) -> None:
+    """
+    Copy src to dst in kernel space. Unlike shutil.copy, the mode is set when
+    dst is created rather than with separate stat and chmod calls.
+    """
+    with open(src, "rb") as fsrc:
+        mode = os.fstat(fsrc.fileno()).st_mode & 0o777
+        fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+        with open(fd, "wb") as fdst:
+            while os.sendfile(fdst.fileno(), fsrc.fileno(), None, _SENDFILE_CHUNK):
+                pass
+
+
+if sys.platform.startswith("linux"):
+    _reflink = _ficlone
+    _fast_copy = _sendfile_copy
+elif sys.platform == "darwin":
+    _reflink = _load_clonefile()
+    _fast_copy = shutil.copy
+else:
+    _reflink = None
+    _fast_copy = shutil.copy
+
+
+def _reflink_or_copy(src: str, dst: str | Path, device: int | None) -> None:
+    """
+    Populate dst from src as cheaply as possible: a copy-on-write clone when
+    the filesystem supports it, then a hardlink, then a plain copy. device is
+    the st_dev shared by the source and the build context, or None if they
+    live on different filesystems.
+    """
+    # An existing dst, e.g. from overlapping copy entries, may be a hardlink
+    # to a user file: unlink it so that it is replaced, never written through
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(dst)
+    if device is not None:
+        if _reflink is not None and _REFLINK_SUPPORT.get(device, True):
+            try:
+                _reflink(src, dst)
+                _REFLINK_SUPPORT[device] = True
+                return
+            except OSError as e:
+                if e.errno in _REFLINK_UNSUPPORTED_ERRNOS:
+                    _REFLINK_SUPPORT[device] = False
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(dst)
+        try:
+            os.link(src, dst)
+            return
+        except OSError as e:
+            if e.errno not in _LINK_FALLBACK_ERRNOS:
+                raise
+    _fast_copy(src, dst)
+
+
+def _dockerignore_escape(path: str) -> str:
+    path = "".join(f"\\{c}" if c in "*?[\\" else c for c in path)
+    if path.startswith(("#", "!")):
+        path = f"\\{path}"
+    return path
+
+
+def _context_excludes(
+    source_root: str, files: list[str]
+) -> tuple[list[str], list[str]]:
+    """
+    Compute .dockerignore patterns excluding everything under source_root but
+    files. Directories holding none of the files are excluded as a whole and
+    not descended into, which keeps the pattern list short. Files reached
+    through a symlink are excluded too and returned separately, as their
+    content has to be staged instead of the link.
+    """
+    real_root = os.path.realpath(source_root)
+    keep = set()
+    links = []
+    for f in files:
+        rel_path = os.path.relpath(f, start=source_root)
+        if os.path.realpath(f) == os.path.join(real_root, rel_path):
+            keep.add(rel_path)
+        else:
+            links.append(rel_path)
+    keep_dirs = {""}
+    for rel_path in keep:
+        parent = os.path.dirname(rel_path)
+        while parent not in keep_dirs:
+            keep_dirs.add(parent)
+            parent = os.path.dirname(parent)
+
+    excludes = []
+    pending = [""]
+    while pending:
+        rel_dir = pending.pop()
+        with os.scandir(os.path.join(source_root, rel_dir)) as it:
+            for entry in it:
+                rel_path = os.path.join(rel_dir, entry.name)
+                if rel_path in keep_dirs and entry.is_dir(follow_symlinks=False):
+                    pending.append(rel_path)
+                elif rel_path not in keep:
+                    excludes.append(Path(rel_path).as_posix())
+    return sorted(excludes), links
+
+
+def _scan_context_excludes(
+    source_root: str, ignore_group: IgnoreGroup
+) -> tuple[list[str], list[str]]:
+    """
+    Walk source_root and compute .dockerignore patterns for everything that
+    ls_files would leave out with CopyFileDetection.ALL. Unlike ls_files, this
+    relies on the file types cached by os.scandir instead of stat-ing every
+    file, builds relative paths while descending and does not hash the file
+    contents. Symlinked files are excluded too and returned separately, as
+    their content has to be staged instead of the link.
+    """
+    links = []
+
+    def _scan(rel_dir: str) -> tuple[list[str], bool]:
+        # Returns the excludes under rel_dir and whether anything in it is kept
+        excludes = []
+        kept = False
+        with os.scandir(os.path.join(source_root, rel_dir)) as it:
+            entries = list(it)
+        for entry in entries:
+            rel_path = os.path.join(rel_dir, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                sub_excludes, sub_kept = [], False
+                if entry.name not in EXCLUDE_DIRS:
+                    sub_excludes, sub_kept = _scan(rel_path)
+                if sub_kept:
+                    excludes.extend(sub_excludes)
+                    kept = True
+                else:
+                    excludes.append(Path(rel_path).as_posix())
+            # is_file() skips sockets and dangling symlinks, as ls_files does
+            elif entry.is_file() and not ignore_group.is_ignored(rel_path):
+                kept = True
+                if entry.is_symlink():
+                    links.append(rel_path)
+                    excludes.append(Path(rel_path).as_posix())
+            else:
+                excludes.append(Path(rel_path).as_posix())
+        return excludes, kept
+
+    excludes, _ = _scan("")
+    return sorted(excludes), links
+
+
+@functools.lru_cache(maxsize=32)
+def _render_dockerfile(
+    python_version: str,
+    apt_packages: tuple[str, ...],
+    env: tuple[tuple[str, str], ...],
+    pip_secret_mounts: tuple[tuple[str, str], ...],
+    pyproject: str | None,
+    copy_commands: tuple[str, ...],
+    commands: tuple[str, ...],
+) -> str:
+    """
+    Render the Dockerfile from the few ImageSpec fields it depends on, so
+    that identical specs built in a row reuse the same text. pyproject is the
+    generated pyproject.toml, inlined as a heredoc, or None to install from
+    the lock files of the "extra" build context.
+    """
+    # The builder and runtime images ship the same system python, so
+    # the virtualenv resolved in the builder runs as is in the runtime
+    image_python_version = ".".join(python_version.split(".")[:2])
+    uv_image = UV_IMAGE.format(python_version=image_python_version)
+    runtime_image = RUNTIME_IMAGE.format(python_version=image_python_version)
+
+    # Apt packages and user defined env vars are set up in both stages,
+    # as they may be needed to build the dependencies and to run them
+    system_setup = []
+    if apt_packages:
+        system_setup.append(
+            "RUN apt-get update && apt-get install -y "
+            + " ".join(apt_packages)
+            + " && rm -rf /var/lib/apt/lists/*"
+        )
+    if env:
+        envs = " ".join(f"{k}={v}" for k, v in env)
+        system_setup.append(f"ENV {envs}")
+
+    # The copied files are owned by the flytekit user, created in both
+    # stages so that it gets the same uid in the runtime image
+    system_setup.append(
+        "RUN id -u flytekit || useradd --create-home --shell /bin/bash flytekit"
+    )
+
+    # Construct the Dockerfile content: the builder stage resolves and
+    # installs everything with uv, the runtime stage only receives the
+    # result, without any build leftovers
+    dockerfile_content = [
+        # Heredocs and named build contexts need the Dockerfile 1.4+ frontend
+        "# syntax=docker/dockerfile:1",
+        f"FROM {uv_image} AS builder",
+        "WORKDIR /root",
+        *system_setup,
+    ]
+
+    # Set up uv
+    uv_cache_mount = "--mount=type=cache,target=/root/.cache/uv"
+    dockerfile_content.extend(
+        [
+            "ENV UV_COMPILE_BYTECODE=1",
+            "ENV UV_LINK_MODE=copy",
+            "ENV UV_PYTHON_DOWNLOADS=never",
+        ]
+    )
+
+    pip_secret_mount = ""
+    for secret_id, secret_env in pip_secret_mounts:
+        pip_secret_mount += f"--mount=type=secret,id={secret_id},env={secret_env} "
+
+    # Install application dependencies using uv
+    if pyproject is None:
+        # Dependencies are installed from the bind mounted lock files,
+        # the project itself once its sources are copied
+        deps_commands = [
+            f"RUN {pip_secret_mount} {uv_cache_mount} "
+            f"--mount=type=bind,from=extra,source={_LOCK_FILES_DIR}/uv.lock,"
+            "target=uv.lock "
+            f"--mount=type=bind,from=extra,source={_LOCK_FILES_DIR}/pyproject.toml,"
+            "target=pyproject.toml "
+            "uv sync --locked --no-dev --no-install-project",
+            f"COPY --from=extra --chown=flytekit {_LOCK_FILES_DIR}/uv.lock "
+            f"{_LOCK_FILES_DIR}/pyproject.toml /root/",
+        ]
+        project_commands = [
+            f"RUN {pip_secret_mount} {uv_cache_mount} uv sync --frozen --no-dev"
+        ]
+    else:
+        # The generated project has no build system, so there is
+        # nothing to install once the sources are copied
+        deps_commands = [
+            f'COPY --chown=flytekit <<"EOF" /root/pyproject.toml\n{pyproject}EOF',
+            f"RUN {pip_secret_mount} {uv_cache_mount} "
+            f"uv sync --no-dev --python {image_python_version}",
+        ]
+        project_commands = []
+
+    # Custom commands run in the final image, with uv brought along in
+    # case they call it
+    custom_commands = []
+    if commands:
+        custom_commands.append(f"COPY --from=builder {_UV_BIN} {_UV_BIN}")
+        custom_commands.extend(f"RUN {cmd}" for cmd in commands)
+
+    # Order layers from least to most frequently changing so that
+    # source edits do not invalidate the dependency layers
+    dockerfile_content.extend(
+        [
+            *deps_commands,
+            *copy_commands,
+            *project_commands,
+            f"FROM {runtime_image} AS runtime",
+            "WORKDIR /root",
+            *system_setup,
+            "COPY --from=builder /root /root",
+            "ENV PATH=/root/.venv/bin:$PATH",
+            "ENTRYPOINT []",
+            *custom_commands,
+        ]
+    )
+
+    return "\n".join(dockerfile_content)
+
+
+@functools.cache
+def _check_buildkit() -> None:
+    """
+    The generated Dockerfile relies on BuildKit (RUN --mount, named build
+    contexts, Dockerfile-specific ignore files), so fail early without it.
+    """
+    result = subprocess.run(
+        ["docker", "buildx", "version"], capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"The uv builder requires BuildKit (docker buildx):\n{result.stderr}"
+        )
+
+
+@functools.cache
+def _registry_cache_supported() -> bool:
+    """
+    Whether the current buildx builder can export a registry cache. The
+    default docker driver cannot, and only supports the inline cache.
+    """
+    try:
+        result = subprocess.run(
+            ["docker", "buildx", "inspect"], capture_output=True, text=True
+        )
+    except FileNotFoundError:
+        return False
+    for line in result.stdout.splitlines():
+        key, _, value = line.partition(":")
+        if key.strip() == "Driver":
+            return value.strip() in _REGISTRY_CACHE_DRIVERS
+    return False
+
+
+def _run_docker_build(build_command: list[str], stdin: str | None = None) -> None:
+    """
+    Run docker build with BuildKit enabled, streaming its combined output to
+    the logger line by line instead of buffering it until completion. stdin,
+    if given, is written to the standard input of docker build.
+    """
+    env = {**os.environ, "DOCKER_BUILDKIT": "1", "PYTHONUNBUFFERED": "1"}
+    tail = collections.deque(maxlen=_BUILD_LOG_TAIL)
+    with subprocess.Popen(
+        build_command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        bufsize=1,
+        env=env,
+        stdin=None if stdin is None else subprocess.PIPE,
+    ) as p:
+        if stdin is not None:
+            # docker may exit before reading it, e.g. on a bad flag, in which
+            # case its output still tells why
+            with contextlib.suppress(BrokenPipeError):
+                p.stdin.write(stdin)
+            with contextlib.suppress(BrokenPipeError):
+                p.stdin.close()
+        for line in p.stdout:
+            line = line.rstrip()
+            logger.info(line)
+            tail.append(line)
+        returncode = p.wait()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(
+            returncode, build_command, output="\n".join(tail)
+        )
 
 
 class UvImageBuilder(ImageSpecBuilder):
@@ -47,203 +483,202 @@ class UvImageBuilder(ImageSpecBuilder):
             getattr(image_spec, "override_source_root", None) or image_spec.source_root
         )
 
-        # Create a temporary directory for the build context
-        copy_commands = []
-        with tempfile.TemporaryDirectory() as temp_dir:
-            build_context_path = Path(temp_dir)
-
-            if (
-                image_spec.source_copy_mode is not None
-                and image_spec.source_copy_mode != CopyFileDetection.NO_COPY
-            ):
-                if not source_root:
-                    raise ValueError(
-                        f"Field source_root for {image_spec} must be set"
-                        " when copy is set"
-                    )
-
-                source_path = build_context_path / "src"
-                source_path.mkdir(parents=True, exist_ok=True)
-                ignores = [GitIgnore, DockerIgnore, StandardIgnore]
-                if image_spec.packages:
-                    ignores.append(UVIgnore)
-                ignore = IgnoreGroup(
-                    source_root,
-                    ignores,
-                )
+        if image_spec.base_image:
+            raise NotImplementedError(
+                f"Only support default uv image {image_spec.base_image} for now"
+            )
 
-                ls, _ = ls_files(
-                    str(source_root),
-                    image_spec.source_copy_mode,
-                    deref_symlinks=False,
-                    ignore_group=ignore,
-                )
+        # Pin python version, if provided, otherwise use DEFAULT_PYTHON_VERSION
+        python_version = DEFAULT_PYTHON_VERSION
+        if image_spec.python_version:
+            python_version = image_spec.python_version
 
-                for file_to_copy in ls:
-                    rel_path = os.path.relpath(file_to_copy, start=str(source_root))
-                    Path(source_path / rel_path).parent.mkdir(
-                        parents=True, exist_ok=True
-                    )
-                    shutil.copy(
-                        file_to_copy,
-                        source_path / rel_path,
+        copy_sources = (
+            image_spec.source_copy_mode is not None
+            and image_spec.source_copy_mode != CopyFileDetection.NO_COPY
+        )
+        pyproject = None
+        if not image_spec.requirements:
+            pyproject = _render_pyproject(image_spec, python_version)
+
+        # The sources are sent to docker straight from source_root, so the
+        # temporary directory only holds the Dockerfile and the extra files
+        # (lock files, image_spec.copy) exposed as the "extra" build context.
+        # Without any of them, the Dockerfile is piped to docker build and
+        # there is no build context at all
+        copy_commands = []
+        dockerfile_path = None
+        context_args = ["-"]
+        with contextlib.ExitStack() as stack:
+            if copy_sources or image_spec.copy or image_spec.requirements:
+                temp_dir = stack.enter_context(tempfile.TemporaryDirectory())
+                dockerfile_path = Path(temp_dir) / "Dockerfile"
+                build_context_path = Path(temp_dir) / "extra"
+                build_context_path.mkdir()
+                device = os.stat(build_context_path).st_dev
+                context_root = build_context_path
+
+                # Stage the lock files uv installs the dependencies from in
+                # their own directory, so that the hardlinks staged for
+                # image_spec.copy are never written through
+                if image_spec.requirements:
+                    requirement_basename = os.path.basename(image_spec.requirements)
+                    if requirement_basename != "uv.lock":
+                        raise NotImplementedError(
+                            "image_spec.requirements other than uv.lock "
+                            "not supported yet"
+                        )
+                    lock_files_path = build_context_path / _LOCK_FILES_DIR
+                    lock_files_path.mkdir()
+                    _copy_lock_files_into_context(
+                        image_spec,
+                        "uv.lock",
+                        lock_files_path,
                     )
 
-                copy_commands.append("COPY --chown=flytekit ./src /root")
-
-            if image_spec.copy:
-                for src in image_spec.copy:
-                    src_path = Path(src)
-
-                    if src_path.is_absolute() or ".." in src_path.parts:
+                if copy_sources:
+                    if not source_root:
                         raise ValueError(
-                            "Absolute paths or paths with '..' "
-                            "are not allowed in COPY command."
+                            f"Field source_root for {image_spec} must be set"
+                            " when copy is set"
                         )
 
-                    dst_path = build_context_path / src_path
-                    dst_path.parent.mkdir(parents=True, exist_ok=True)
+                    ignores = [GitIgnore, DockerIgnore, StandardIgnore]
+                    if not image_spec.requirements:
+                        ignores.append(UVIgnore)
+                    ignore = IgnoreGroup(str(source_root), ignores)
 
-                    if src_path.is_dir():
-                        shutil.copytree(src_path, dst_path, dirs_exist_ok=True)
-                        copy_commands.append(
-                            f"COPY --chown=flytekit {src_path.as_posix()} /root/{src_path.as_posix()}/"  # noqa: E501
+                    if image_spec.source_copy_mode == CopyFileDetection.ALL:
+                        excludes, links = _scan_context_excludes(
+                            str(source_root), ignore
                         )
                     else:
-                        shutil.copy(src_path, dst_path)
+                        ls, _ = ls_files(
+                            str(source_root),
+                            image_spec.source_copy_mode,
+                            deref_symlinks=False,
+                            ignore_group=ignore,
+                        )
+                        excludes, links = _context_excludes(str(source_root), ls)
+
+                    # The lock files are copied on their own, ahead of the sources
+                    if image_spec.requirements:
+                        excludes.extend(["pyproject.toml", "uv.lock"])
+                        links = [
+                            link
+                            for link in links
+                            if link not in ("pyproject.toml", "uv.lock")
+                        ]
+
+                    # A Dockerfile-specific ignore file takes precedence over any
+                    # .dockerignore in source_root
+                    Path(f"{dockerfile_path}.dockerignore").write_text(
+                        "\n".join(_dockerignore_escape(e) for e in excludes)
+                    )
+                    context_root = Path(source_root)
+
+                    copy_commands.append("COPY --chown=flytekit . /root")
+
+                    # Docker would ship the symlinks themselves, dangling in the
+                    # image when they point outside source_root, so the files
+                    # they point to are staged in the extra context instead
+                    if links:
+                        links_path = build_context_path / _SYMLINKS_DIR
+                        for link in links:
+                            target = os.path.realpath(os.path.join(source_root, link))
+                            dst_path = links_path / link
+                            dst_path.parent.mkdir(parents=True, exist_ok=True)
+                            src_device = (
+                                device if os.stat(target).st_dev == device else None
+                            )
+                            _reflink_or_copy(target, dst_path, src_device)
                         copy_commands.append(
-                            f"COPY --chown=flytekit {src_path.as_posix()} /root/{src_path.parent.as_posix()}/"  # noqa: E501
+                            "COPY --from=extra --chown=flytekit "
+                            f"{_SYMLINKS_DIR}/ /root/"
                         )
 
-            # Define the base image
-            base_image = DEFAULT_UV_IMAGE
-            if image_spec.base_image:
-                raise NotImplementedError(
-                    f"Only support default uv image {image_spec.base_image} for now"
-                )
-
-            # Construct the Dockerfile content
-            dockerfile_content = [
-                f"FROM {base_image}",
-                "WORKDIR /root",
-            ]
-
-            # Add any apt packages
-            if image_spec.apt_packages:
-                dockerfile_content.append(
-                    "RUN apt-get update && apt-get install -y "
-                    + " ".join(image_spec.apt_packages)
-                    + " && rm -rf /var/lib/apt/lists/*"
-                )
+                if image_spec.copy:
+                    src_paths = [Path(src) for src in image_spec.copy]
+                    for src_path in src_paths:
+                        if src_path.is_absolute() or ".." in src_path.parts:
+                            raise ValueError(
+                                "Absolute paths or paths with '..' "
+                                "are not allowed in COPY command."
+                            )
+                        # The lock files land in /root, ahead of the copies
+                        if src_path.parts[:1] == (_LOCK_FILES_DIR,) or (
+                            image_spec.requirements
+                            and src_path.as_posix() in _UV_IGNORED
+                        ):
+                            raise ValueError(
+                                f"Cannot copy {src_path}, it collides with "
+                                "the lock files of image_spec.requirements."
+                            )
+
+                    # Create each destination directory once, not once per entry
+                    for parent in {(build_context_path / p).parent for p in src_paths}:
+                        parent.mkdir(parents=True, exist_ok=True)
+
+                    for src_path in src_paths:
+                        dst_path = build_context_path / src_path
+                        src_stat = os.stat(src_path)
+                        src_device = device if src_stat.st_dev == device else None
+                        copy_function = functools.partial(
+                            _reflink_or_copy, device=src_device
+                        )
 
-            # Set user defined env vars
-            if image_spec.env:
-                envs = " ".join(f"{k}={v}" for k, v in image_spec.env.items())
-                dockerfile_content.append(f"ENV {envs}")
-
-            # Set up uv
-            uv_cache_mount = "--mount=type=cache,target=/root/.cache/uv"
-            dockerfile_content.extend(
-                [
-                    "ENV UV_COMPILE_BYTECODE=1",
-                    "ENV UV_LINK_MODE=copy",
+                        if stat.S_ISDIR(src_stat.st_mode):
+                            shutil.copytree(
+                                src_path,
+                                dst_path,
+                                dirs_exist_ok=True,
+                                copy_function=copy_function,
+                            )
+                            copy_commands.append(
+                                f"COPY --from=extra --chown=flytekit {src_path.as_posix()} /root/{src_path.as_posix()}/"  # noqa: E501
+                            )
+                        else:
+                            copy_function(str(src_path), dst_path)
+                            copy_commands.append(
+                                f"COPY --from=extra --chown=flytekit {src_path.as_posix()} /root/{src_path.parent.as_posix()}/"  # noqa: E501
+                            )
+
+                context_args = [
+                    "--file",
+                    str(dockerfile_path),
+                    "--build-context",
+                    f"extra={build_context_path}",
+                    str(context_root),
                 ]
-            )
-
-            pip_secret_mount = ""
-            if image_spec.pip_secret_mounts:
-                for secret_id, secret_env in image_spec.pip_secret_mounts:
-                    pip_secret_mount += (
-                        f"--mount=type=secret,id={secret_id},env={secret_env} "
-                    )
-
-            # Install application dependencies using uv
-            uv_config_mount = ""
-            if image_spec.requirements:
-                requirement_basename = os.path.basename(image_spec.requirements)
-                if requirement_basename == "uv.lock":
-                    _copy_lock_files_into_context(
-                        image_spec,
-                        "uv.lock",
-                        build_context_path,
-                    )
-                    uv_config_mount = (
-                        "--mount=type=bind,source=uv.lock,target=uv.lock "
-                        "--mount=type=bind,source=pyproject.toml,target=pyproject.toml"
-                    )
-                    copy_commands.append(
-                        "COPY --chown=flytekit ./uv.lock /root/uv.lock"
-                    )
-                    copy_commands.append(
-                        "COPY --chown=flytekit ./pyproject.toml /root/pyproject.toml"
-                    )
-                else:
-                    raise NotImplementedError(
-                        "image_spec.requirements other than uv.lock not supported yet"
-                    )
-            elif image_spec.packages:
-                # Pin python version, if provided, otherwise use DEFAULT_PYTHON_VERSION
-                python_version = DEFAULT_PYTHON_VERSION
-                if image_spec.python_version:
-                    python_version = image_spec.python_version
-
-                dockerfile_content.append(
-                    f"RUN uv init --bare --no-workspace --no-config --python {python_version}",  # noqa: E501
-                )
 
-                # Add flytekit
-                flytekit_version = flytekit.__version__ or DEFAULT_FLYTEKIT_VERSION
-                dockerfile_content.append(
-                    f"RUN {uv_cache_mount} uv add flytekit=={flytekit_version}",
-                )
-
-                uv_add_cmd = (
-                    f"RUN {uv_cache_mount} {pip_secret_mount} "
-                    f"uv add {' '.join(image_spec.packages)} "
-                )
-                if image_spec.pip_index:
-                    uv_add_cmd += f"--index {image_spec.pip_index} "
-                if image_spec.pip_extra_index_url:
-                    for extra_index_url in image_spec.pip_extra_index_url:
-                        uv_add_cmd += f"--index {extra_index_url} "
-                dockerfile_content.append(uv_add_cmd)
-
-            uv_sync_cmd = (
-                f"RUN {pip_secret_mount} {uv_cache_mount} {uv_config_mount} "
-                "uv sync --locked --no-dev"
+            dockerfile_str = _render_dockerfile(
+                str(python_version),
+                tuple(image_spec.apt_packages or ()),
+                tuple((image_spec.env or {}).items()),
+                tuple(tuple(m) for m in image_spec.pip_secret_mounts or ()),
+                pyproject,
+                tuple(copy_commands),
+                tuple(image_spec.commands or ()),
             )
-            dockerfile_content.extend(
-                [
-                    f"{uv_sync_cmd} --no-install-project",
-                    *copy_commands,
-                    uv_sync_cmd,
-                    "ENV PATH=/root/.venv/bin:$PATH",
-                    "ENTRYPOINT []",
-                ]
-            )
-
-            # Add any custom commands
-            if image_spec.commands:
-                for cmd in image_spec.commands:
-                    dockerfile_content.append(f"RUN {cmd}")
+            logger.info(f"Generated Dockerfile:\n{dockerfile_str}")
 
-            # Write the Dockerfile to the build context
-            dockerfile_path = build_context_path / "Dockerfile"
-            dockerfile_path.write_text("\n".join(dockerfile_content))
-            logger.info(f"Generated Dockerfile:\n{dockerfile_path.read_text()}")
+            # Write the Dockerfile next to, not into, the build contexts
+            if dockerfile_path is not None:
+                dockerfile_path.write_text(dockerfile_str)
 
             # --- Step 2: Execute the Docker build command ---
             build_command = [
                 "docker",
+                "buildx",
                 "build",
                 "--tag",
                 target_image,
-                "--file",
-                str(dockerfile_path),
                 "--platform",
                 image_spec.platform,
-                "--push",
-                str(build_context_path),
+                # Stream the layers to the registry as they are produced
+                "--output",
+                "type=registry,push=true",
+                *context_args,
             ]
 
             if image_spec.pip_secret_mounts:
@@ -252,20 +687,50 @@ class UvImageBuilder(ImageSpecBuilder):
                         ["--secret", f"id={secret_id},env={secret_env}"]
                     )
 
+            builder_options = image_spec.builder_options or {}
+            for option in ("cache_from", "cache_to"):
+                refs = builder_options.get(option, [])
+                if not isinstance(refs, list) or not all(
+                    isinstance(ref, str) for ref in refs
+                ):
+                    raise ValueError(
+                        f"builder_options[{option!r}] must be a list of strings,"
+                        f" got {refs!r}"
+                    )
+
+            # Reuse layers from the previous build. target_image is tagged
+            # with a hash of the spec, so the cache lives under a stable tag,
+            # exported with mode=max to also cover the builder stage where
+            # uv sync runs. An inline cache would only cover the runtime
+            # stage, which is no use, so without a builder able to export a
+            # registry cache there is no default cache at all
+            cache_from, cache_to = [], []
+            if _registry_cache_supported():
+                cache_ref = (
+                    f"type=registry,ref={target_image.rpartition(':')[0]}:{CACHE_TAG}"
+                )
+                cache_from = [cache_ref]
+                cache_to = [f"{cache_ref},mode=max"]
+            cache_from.extend(builder_options.get("cache_from", []))
+            cache_to = builder_options.get("cache_to", cache_to)
+            for cache_ref in cache_from:
+                build_command.extend(["--cache-from", cache_ref])
+            for cache_ref in cache_to:
+                build_command.extend(["--cache-to", cache_ref])
+
             logger.info(f"Executing build command: {' '.join(build_command)}")
 
             try:
                 # Execute the Docker build
-                subprocess.run(
+                _check_buildkit()
+                _run_docker_build(
                     build_command,
-                    check=True,
+                    stdin=dockerfile_str if dockerfile_path is None else None,
                 )
                 logger.info(f"Successfully built image: {target_image}")
             except subprocess.CalledProcessError as e:
-                logger.error(
-                    f"Image build failed. Stderr:\n{e.stderr}\nStdout:\n{e.stdout}"
-                )
-                raise Exception(f"Image build failed: {e.stderr}") from e
+                logger.error(f"Image build failed. Output:\n{e.output}")
+                raise Exception(f"Image build failed: {e.output}") from e
             except FileNotFoundError as e:
                 logger.error(
                     "Docker command not found. Is Docker installed and in your PATH?"
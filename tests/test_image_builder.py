@@ -0,0 +1,418 @@
+import itertools
+import os
+import re
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from flytekit.constants import CopyFileDetection
+from flytekit.image_spec.image_spec import ImageSpec
+from flytekit.tools.ignore import DockerIgnore, GitIgnore, IgnoreGroup, StandardIgnore
+from flytekit.tools.script_mode import ls_files
+
+from flytekitplugins.uv import image_builder
+from flytekitplugins.uv.image_builder import (
+    UvImageBuilder,
+    _context_excludes,
+    _dockerignore_escape,
+    _reflink_or_copy,
+    _render_pyproject,
+    _run_docker_build,
+    _scan_context_excludes,
+)
+
+WEIRD_NAMES = ["[weird]*?.py", "#hash.py", "!bang.py", "back\\slash.py"]
+
+
+def _dockerignore_regex(pattern: str) -> re.Pattern:
+    # Translate a pattern the way docker's filepath.Match reads it: a
+    # backslash escapes the next character, wildcards stop at separators
+    regex = ""
+    chars = iter(pattern)
+    for c in chars:
+        if c == "\\":
+            regex += re.escape(next(chars))
+        elif c == "*":
+            regex += "[^/]*"
+        elif c == "?":
+            regex += "[^/]"
+        else:
+            regex += re.escape(c)
+    return re.compile(regex)
+
+
+@pytest.fixture
+def docker_build(monkeypatch: pytest.MonkeyPatch) -> dict:
+    # Stub out docker, recording the build command, the Dockerfile and the
+    # files staged in the "extra" build context
+    build = {}
+
+    def _run_docker_build(build_command, stdin=None):
+        build["command"] = build_command
+        build["dockerfile"] = stdin
+        build["extra"] = {}
+        if "--file" in build_command:
+            dockerfile = build_command[build_command.index("--file") + 1]
+            build["dockerfile"] = Path(dockerfile).read_text()
+            extra = next(
+                arg.removeprefix("extra=")
+                for arg in build_command
+                if arg.startswith("extra=")
+            )
+            for root, _, files in os.walk(extra):
+                for name in files:
+                    path = Path(root) / name
+                    rel_path = path.relative_to(extra).as_posix()
+                    build["extra"][rel_path] = path.read_text()
+
+    monkeypatch.setattr(image_builder, "_check_buildkit", lambda: None)
+    monkeypatch.setattr(image_builder, "_registry_cache_supported", lambda: False)
+    monkeypatch.setattr(image_builder, "_run_docker_build", _run_docker_build)
+    return build
+
+
+def _sent_files(source_root: Path, excludes: list[str]) -> set[str]:
+    # Files docker sends: those not matched by a pattern, nor under a
+    # directory matched by one
+    regexes = [_dockerignore_regex(e) for e in excludes]
+    sent = set()
+    for root, _, files in os.walk(source_root):
+        for name in files:
+            rel_path = (Path(root) / name).relative_to(source_root).as_posix()
+            parts = rel_path.split("/")
+            prefixes = ["/".join(parts[:i]) for i in range(1, len(parts) + 1)]
+            if not any(r.fullmatch(p) for r in regexes for p in prefixes):
+                sent.add(rel_path)
+    return sent
+
+
+@pytest.fixture
+def source_root(tmp_path: Path) -> Path:
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    files = [
+        "main.py",
+        "pkg/__init__.py",
+        "pkg/mod.py",
+        "pkg/__pycache__/mod.cpython-312.pyc",
+        "app.log",
+        "logs/run.log",
+        "build/out.bin",
+        "docs/sub/[weird]*?.py",
+        *WEIRD_NAMES,
+    ]
+    for f in files:
+        (tmp_path / f).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / f).write_text(f)
+    (tmp_path / ".gitignore").write_text("*.log\nbuild/\n")
+    (tmp_path / "empty").mkdir()
+    (tmp_path / "link.py").symlink_to("main.py")
+    (tmp_path / "dangling.py").symlink_to("missing.py")
+    return tmp_path
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is required")
+@pytest.mark.parametrize("scan", [True, False])
+def test_excludes_match_ls_files(source_root: Path, scan: bool):
+    ignore_group = IgnoreGroup(
+        str(source_root), [GitIgnore, DockerIgnore, StandardIgnore]
+    )
+    ls, _ = ls_files(
+        str(source_root),
+        CopyFileDetection.ALL,
+        deref_symlinks=False,
+        ignore_group=ignore_group,
+    )
+    selected = {Path(f).relative_to(source_root).as_posix() for f in ls}
+
+    if scan:
+        excludes, links = _scan_context_excludes(str(source_root), ignore_group)
+    else:
+        excludes, links = _context_excludes(str(source_root), ls)
+    escaped = [_dockerignore_escape(e) for e in excludes]
+
+    assert links == ["link.py"]
+    assert _sent_files(source_root, escaped) == selected - {"link.py"}
+    assert set(WEIRD_NAMES) <= selected
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is required")
+def test_excludes_everything_ignored(tmp_path: Path):
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    (tmp_path / ".gitignore").write_text("*\n")
+    (tmp_path / "main.py").write_text("")
+    ignore_group = IgnoreGroup(str(tmp_path), [GitIgnore])
+
+    excludes, links = _scan_context_excludes(str(tmp_path), ignore_group)
+    escaped = [_dockerignore_escape(e) for e in excludes]
+
+    assert links == []
+    assert _sent_files(tmp_path, escaped) == set()
+
+
+@pytest.mark.parametrize(
+    ("path", "escaped"),
+    [
+        ("pkg/mod.py", "pkg/mod.py"),
+        ("[weird]*?.py", "\\[weird]\\*\\?.py"),
+        ("back\\slash.py", "back\\\\slash.py"),
+        ("#hash.py", "\\#hash.py"),
+        ("!bang.py", "\\!bang.py"),
+        ("pkg/#hash.py", "pkg/#hash.py"),
+    ],
+)
+def test_dockerignore_escape(path: str, escaped: str):
+    assert _dockerignore_escape(path) == escaped
+    assert _dockerignore_regex(escaped).fullmatch(path)
+
+
+def test_run_docker_build_exits_before_reading_stdin():
+    with pytest.raises(subprocess.CalledProcessError) as exc_info:
+        _run_docker_build(
+            [sys.executable, "-c", "print('bad flag'); exit(3)"],
+            stdin="FROM scratch\n" * 100_000,
+        )
+    assert exc_info.value.returncode == 3
+    assert exc_info.value.output == "bad flag"
+
+
+@pytest.mark.parametrize("same_device", [True, False])
+def test_reflink_or_copy_replaces_hardlinked_destination(
+    tmp_path: Path, same_device: bool
+):
+    user_file = tmp_path / "user.txt"
+    user_file.write_text("user")
+    src = tmp_path / "src.txt"
+    src.write_text("staged")
+    dst = tmp_path / "dst.txt"
+    os.link(user_file, dst)
+    device = os.stat(tmp_path).st_dev if same_device else None
+
+    _reflink_or_copy(str(src), dst, device)
+
+    assert user_file.read_text() == "user"
+    assert dst.read_text() == "staged"
+
+
+@pytest.fixture
+def lock_project(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "deps").mkdir()
+    for label, root in (("root", tmp_path), ("deps", tmp_path / "deps")):
+        (root / "pyproject.toml").write_text(f"{label} pyproject")
+        (root / "uv.lock").write_text(f"{label} lock")
+    (tmp_path / "main.py").write_text("main")
+    return tmp_path
+
+
+@pytest.mark.parametrize("requirements", ["deps/uv.lock", "uv.lock"])
+@pytest.mark.parametrize("copy", [["pyproject.toml"], ["uv.lock"], [".uv-lock"]])
+def test_copy_colliding_with_lock_files_is_rejected(
+    lock_project: Path, docker_build: dict, requirements, copy
+):
+    image_spec = ImageSpec(
+        name="img", builder="uv", requirements=requirements, copy=copy
+    )
+    with pytest.raises(ValueError, match="collides with the lock files"):
+        UvImageBuilder().build_image(image_spec)
+    assert (lock_project / "pyproject.toml").read_text() == "root pyproject"
+
+
+def test_lock_files_never_written_through_copies(
+    lock_project: Path, docker_build: dict
+):
+    (lock_project / "deps" / "main.py").write_text("deps main")
+    image_spec = ImageSpec(
+        name="img",
+        builder="uv",
+        requirements="deps/uv.lock",
+        copy=["deps", "main.py"],
+    )
+    UvImageBuilder().build_image(image_spec)
+
+    assert docker_build["extra"] == {
+        ".uv-lock/pyproject.toml": "deps pyproject",
+        ".uv-lock/uv.lock": "deps lock",
+        "deps/main.py": "deps main",
+        "deps/pyproject.toml": "deps pyproject",
+        "deps/uv.lock": "deps lock",
+        "main.py": "main",
+    }
+    for label, root in (("root", lock_project), ("deps", lock_project / "deps")):
+        assert (root / "pyproject.toml").read_text() == f"{label} pyproject"
+        assert (root / "uv.lock").read_text() == f"{label} lock"
+
+
+@pytest.mark.parametrize(
+    "builder_options",
+    [
+        {"cache_from": "ghcr.io/my-org/my-image:cache"},
+        {"cache_to": "type=inline"},
+        {"cache_from": ("ghcr.io/my-org/my-image:cache",)},
+        {"cache_to": [{"type": "inline"}]},
+    ],
+)
+def test_invalid_cache_options_are_rejected(docker_build: dict, builder_options):
+    image_spec = ImageSpec(name="img", builder="uv", builder_options=builder_options)
+    with pytest.raises(ValueError, match="must be a list of strings"):
+        UvImageBuilder().build_image(image_spec)
+    assert docker_build == {}
+
+
+def _flag_values(command: list[str], flag: str) -> list[str]:
+    return [value for arg, value in itertools.pairwise(command) if arg == flag]
+
+
+@pytest.mark.parametrize(
+    ("registry_cache", "builder_options", "cache_from", "cache_to"),
+    [
+        (False, None, [], []),
+        (
+            True,
+            None,
+            ["type=registry,ref=reg/img:buildcache"],
+            ["type=registry,ref=reg/img:buildcache,mode=max"],
+        ),
+        (
+            False,
+            {"cache_from": ["reg/a", "reg/b"], "cache_to": ["type=inline"]},
+            ["reg/a", "reg/b"],
+            ["type=inline"],
+        ),
+        (
+            True,
+            {"cache_from": ["reg/a"], "cache_to": []},
+            ["type=registry,ref=reg/img:buildcache", "reg/a"],
+            [],
+        ),
+    ],
+)
+def test_cache_options(
+    docker_build: dict,
+    monkeypatch: pytest.MonkeyPatch,
+    registry_cache,
+    builder_options,
+    cache_from,
+    cache_to,
+):
+    monkeypatch.setattr(
+        image_builder, "_registry_cache_supported", lambda: registry_cache
+    )
+    image_spec = ImageSpec(
+        name="img", registry="reg", builder="uv", builder_options=builder_options
+    )
+    UvImageBuilder().build_image(image_spec)
+
+    assert _flag_values(docker_build["command"], "--cache-from") == cache_from
+    assert _flag_values(docker_build["command"], "--cache-to") == cache_to
+
+
+def test_render_pyproject():
+    image_spec = ImageSpec(
+        name="img",
+        packages=["pandas>=2", 'numpy; python_version < "3.13"'],
+        pip_index="https://pypi.example.com/simple",
+        pip_extra_index_url=["https://extra.example.com/simple"],
+    )
+    assert _render_pyproject(image_spec, "3.12") == "\n".join(
+        [
+            "[project]",
+            'name = "root"',
+            'version = "0.1.0"',
+            'requires-python = ">=3.12"',
+            "dependencies = [",
+            f'    "flytekit=={image_builder._FLYTEKIT_VERSION}",',
+            '    "pandas>=2",',
+            '    "numpy; python_version < \\"3.13\\"",',
+            "]",
+            "",
+            "[[tool.uv.index]]",
+            'url = "https://pypi.example.com/simple"',
+            "",
+            "[[tool.uv.index]]",
+            'url = "https://extra.example.com/simple"',
+            "",
+        ]
+    )
+
+
+@pytest.mark.parametrize(
+    ("image_spec_kwargs", "stdin", "builder_lines", "runtime_tail"),
+    [
+        # Packages only: no build context, the Dockerfile is piped to docker
+        (
+            {"packages": ["pandas"], "python_version": "3.12.4"},
+            True,
+            [
+                'COPY --chown=flytekit <<"EOF" /root/pyproject.toml',
+                '    "pandas",',
+                "uv sync --no-dev --python 3.12",
+            ],
+            ["ENV PATH=/root/.venv/bin:$PATH", "ENTRYPOINT []"],
+        ),
+        # Packages and extra files, custom commands run in the final image
+        (
+            {"packages": ["pandas"], "copy": ["main.py"], "commands": ["uv pip list"]},
+            False,
+            [
+                'COPY --chown=flytekit <<"EOF" /root/pyproject.toml',
+                "uv sync --no-dev --python 3.12",
+                "COPY --from=extra --chown=flytekit main.py /root/./",
+            ],
+            [
+                "ENTRYPOINT []",
+                "COPY --from=builder /usr/local/bin/uv /usr/local/bin/uv",
+                "RUN uv pip list",
+            ],
+        ),
+        # uv.lock: dependencies from the staged lock files, then the project
+        (
+            {"requirements": "uv.lock"},
+            False,
+            [
+                "source=.uv-lock/uv.lock,target=uv.lock",
+                "source=.uv-lock/pyproject.toml,target=pyproject.toml",
+                "uv sync --locked --no-dev --no-install-project",
+                "COPY --from=extra --chown=flytekit .uv-lock/uv.lock "
+                ".uv-lock/pyproject.toml /root/",
+                "uv sync --frozen --no-dev",
+            ],
+            ["ENV PATH=/root/.venv/bin:$PATH", "ENTRYPOINT []"],
+        ),
+    ],
+)
+def test_render_dockerfile(
+    lock_project: Path,
+    docker_build: dict,
+    image_spec_kwargs,
+    stdin,
+    builder_lines,
+    runtime_tail,
+):
+    image_spec = ImageSpec(name="img", builder="uv", **image_spec_kwargs)
+    UvImageBuilder().build_image(image_spec)
+
+    command = docker_build["command"]
+    assert (command[-1] == "-") is stdin
+    assert ("--file" in command) is not stdin
+
+    lines = docker_build["dockerfile"].split("\n")
+    assert lines[:2] == [
+        "# syntax=docker/dockerfile:1",
+        "FROM ghcr.io/astral-sh/uv:python3.12-bookworm-slim AS builder",
+    ]
+    runtime_start = lines.index("FROM python:3.12-slim-bookworm AS runtime")
+    builder = "\n".join(lines[:runtime_start])
+    runtime = "\n".join(lines[runtime_start:])
+
+    # The flytekit user exists before any file is copied with its ownership
+    useradd = "RUN id -u flytekit || useradd --create-home --shell /bin/bash flytekit"
+    assert builder.index(useradd) < builder.index("--chown=flytekit")
+    assert useradd in runtime
+    for line in builder_lines:
+        assert line in builder
+
+    assert "COPY --from=builder /root /root" in runtime
+    assert "uv sync" not in runtime
+    assert lines[-len(runtime_tail) :] == runtime_tail